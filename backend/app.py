@@ -6,23 +6,107 @@ Provides text-to-speech with viseme generation for lip-sync capabilities
 
 import os
 import io
-import json
-import base64
+import re
+import secrets
+import wave
+import gzip
+import hashlib
 import tempfile
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file
+from types import MappingProxyType
+from flask import Flask, Response, request, send_file, url_for
+from flask_compress import Compress
 from flask_cors import CORS
+import msgpack
 import numpy as np
-import librosa
+import orjson
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 from gtts import gTTS
+from gtts import tts as gtts_tts
+from mutagen.mp3 import MP3
 import logging
 
+try:
+    from piper.voice import PiperVoice
+except ImportError:  # Piper is an optional local TTS provider
+    PiperVoice = None
+
+try:
+    from pybase64 import b64encode
+except ImportError:  # pybase64 optionally provides SIMD base64 encoding
+    from base64 import b64encode
+
+try:
+    import numba
+except ImportError:  # numba optionally compiles the viseme scan
+    numba = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=[
+    'X-Visemes', 'X-Visemes-Url', 'X-Audio-Duration', 'X-Sample-Rate', 'X-Cache-Key'
+])
+Compress(app)
+
+def _build_letter_lut(letter_map):
+    """Flatten a letter/digraph viseme map into a byte translation table
+    
+    Single letters map through their own byte value. Digraphs are assigned
+    sentinel bytes above 0x7f, which never occur in ASCII-encoded input.
+    Returns the 256-byte table and the (digraph, sentinel) replacements.
+    """
+    table = bytearray(256)
+    digraphs = []
+    
+    for letters, viseme_id in letter_map.items():
+        if len(letters) == 1:
+            table[ord(letters)] = viseme_id
+        else:
+            sentinel = 0x80 + len(digraphs)
+            table[sentinel] = viseme_id
+            digraphs.append((letters.encode('ascii'), bytes([sentinel])))
+    
+    return bytes(table), tuple(digraphs)
+
+def _scan_visemes(buf, lut, space=32):
+    """Translate a space-separated byte buffer into viseme IDs
+    
+    Returns the viseme ID of every non-space byte and the index into those
+    IDs at which each word starts.
+    """
+    ids = np.empty(buf.shape[0], dtype=np.int8)
+    word_starts = np.empty(buf.shape[0], dtype=np.int64)
+    count = 0
+    words = 0
+    in_word = False
+    
+    for i in range(buf.shape[0]):
+        byte = buf[i]
+        if byte == space:
+            in_word = False
+            continue
+        if not in_word:
+            word_starts[words] = count
+            words += 1
+            in_word = True
+        ids[count] = lut[byte]
+        count += 1
+    
+    return ids[:count], word_starts[:words]
+
+# Compiled scan, or None to fall back to bytes.translate
+_scan_visemes_jit = (
+    numba.njit(cache=True, boundscheck=False)(_scan_visemes) if numba is not None else None
+)
 
 class VisemeMapper:
     """Maps phonemes to visemes for lip-sync animation"""
@@ -51,168 +135,828 @@ class VisemeMapper:
         'oy': 14, 'aw': 14,      # Complex diphthongs
     }
     
+    # Simple letter-to-viseme mapping for demonstration
+    LETTER_TO_VISEME = {
+        'a': 8, 'e': 10, 'i': 11, 'o': 12, 'u': 12,
+        'p': 1, 'b': 1, 'm': 1,
+        'f': 2, 'v': 2,
+        'th': 3,
+        't': 4, 'd': 4, 'n': 4, 'l': 4, 's': 4,
+        'r': 5, 'ch': 5, 'sh': 5,
+        'k': 6, 'g': 6, 'w': 6, 'y': 6, 'ng': 6,
+        'h': 7,
+        'ay': 13, 'ey': 13,
+        'oy': 14, 'aw': 14,
+    }
+    
+    # Byte lookup table so a word translates to visemes in a single C loop
+    _LETTER_LUT, _DIGRAPHS = _build_letter_lut(LETTER_TO_VISEME)
+    _LETTER_LUT_ARRAY = np.frombuffer(_LETTER_LUT, dtype=np.uint8)
+    
+    # Read-only phoneme lookup holding both the raw and normalized keys
+    _FAST_MAP = MappingProxyType({
+        **VISEME_MAP,
+        **{phoneme.strip().lower(): viseme_id for phoneme, viseme_id in VISEME_MAP.items()}
+    })
+    
     def __init__(self):
         self.viseme_count = 15  # Total number of visemes (0-14)
+        
+        # Compile the scan now rather than on the first request
+        if _scan_visemes_jit is not None:
+            self._text_to_visemes('warm up')
     
     def phoneme_to_viseme(self, phoneme):
         """Convert phoneme to viseme ID"""
+        # Already-clean tokens hit the map without any string work
+        if isinstance(phoneme, str):
+            viseme_id = self._FAST_MAP.get(phoneme)
+            if viseme_id is not None:
+                return viseme_id
+        
         # Clean and normalize phoneme
         phoneme = str(phoneme).lower().strip()
-        return self.VISEME_MAP.get(phoneme, 0)  # Default to silence
+        return self._FAST_MAP.get(phoneme, 0)  # Default to silence
     
     def generate_viseme_sequence(self, text, audio_duration):
-        """Generate basic viseme sequence from text analysis"""
+        """Generate basic viseme sequence from text analysis
+        
+        Returns parallel arrays of viseme IDs, start offsets and durations.
+        """
+        # Simple phonetic approximation based on common letter patterns
+        viseme_ids, counts = self._text_to_visemes(text)
+        if counts.size == 0:
+            return {'viseme_ids': [], 'time_offsets': [], 'durations': []}
+        
+        # Simple approximation: distribute visemes across audio duration,
+        # an equal share per word split evenly between that word's visemes
+        time_per_word = audio_duration / counts.size
+        word_index = np.repeat(np.arange(counts.size), counts)
+        durations = (time_per_word / counts)[word_index]
+        
+        # Each offset is computed directly from its word and position in the
+        # word rather than by summing durations, so rounding error never
+        # accumulates across the clip
+        first_in_word = np.repeat(np.cumsum(counts) - counts, counts)
+        position_in_word = np.arange(viseme_ids.size) - first_in_word
+        time_offsets = word_index * time_per_word + position_in_word * durations
+        
+        return {
+            'viseme_ids': viseme_ids,
+            'time_offsets': time_offsets,
+            'durations': durations
+        }
+    
+    def concatenate_sequences(self, sequences, start_times):
+        """Join viseme sequences, shifting each one to its start time"""
+        return {
+            'viseme_ids': np.concatenate([seq['viseme_ids'] for seq in sequences]).astype(np.int8),
+            'time_offsets': np.concatenate([
+                np.asarray(seq['time_offsets'], dtype=np.float64) + start
+                for seq, start in zip(sequences, start_times)
+            ]),
+            'durations': np.concatenate([seq['durations'] for seq in sequences]).astype(np.float64)
+        }
+    
+    def to_records(self, visemes):
+        """Convert a viseme track into (viseme_id, time_offset, duration) tuples
+        
+        For clients that need one record per viseme. Plain tuples serialize
+        as compact JSON arrays and cost far less memory than a dict each.
+        """
+        return list(zip(
+            np.asarray(visemes['viseme_ids']).tolist(),
+            np.asarray(visemes['time_offsets']).tolist(),
+            np.asarray(visemes['durations']).tolist()
+        ))
+    
+    def _text_to_visemes(self, text):
+        """Convert text to viseme IDs plus the number of visemes per word"""
         words = text.lower().split()
-        visemes = []
         
-        # Simple approximation: distribute visemes across audio duration
-        time_per_word = audio_duration / max(len(words), 1)
+        if _scan_visemes_jit is not None:
+            buf = np.frombuffer(self._encode(' '.join(words)), dtype=np.uint8)
+            viseme_ids, word_starts = _scan_visemes_jit(buf, self._LETTER_LUT_ARRAY)
+            counts = np.diff(word_starts, append=viseme_ids.size)
+            return viseme_ids, counts
         
-        current_time = 0.0
-        for word in words:
-            word_duration = time_per_word
-            
-            # Simple phonetic approximation based on common letter patterns
-            viseme_sequence = self._word_to_visemes(word)
-            viseme_duration = word_duration / max(len(viseme_sequence), 1)
+        # Translate all words in one call and read the IDs straight from the bytes
+        encoded_words = self._encode(' '.join(words)).split(b' ') if words else []
+        counts = np.fromiter(map(len, encoded_words), dtype=np.int64, count=len(encoded_words))
+        viseme_ids = np.frombuffer(b''.join(encoded_words).translate(self._LETTER_LUT), dtype=np.int8)
+        return viseme_ids, counts
+    
+    def _encode(self, text):
+        """Encode text as ASCII bytes with digraphs collapsed to sentinels"""
+        # Non-ASCII characters become '?', which maps to silence
+        data = text.encode('ascii', 'replace')
+        
+        # No digraph ends with a letter another one starts with, so each
+        # replacement pass is independent of the order they run in
+        for digraph, sentinel in self._DIGRAPHS:
+            data = data.replace(digraph, sentinel)
+        
+        return data
+
+class SpeechCache:
+    """LRU cache of synthesized speech keyed by a hash of (text, language, provider)"""
+    
+    def __init__(self, maxsize=256, cache_dir=None, disk_maxsize=4096, secret=None):
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_dir = self._prepare_dir(cache_dir) if cache_dir else None
+        
+        # Keys are keyed hashes so clients cannot derive the key of a guessed
+        # text and probe the cached speech routes with it
+        if secret:
+            # blake2b keys are capped at 64 bytes, so derive a fixed-size one
+            self._secret = hashlib.sha256(secret.encode('utf-8')).digest()
+        else:
+            self._secret = self._load_secret()
+    
+    @staticmethod
+    def _prepare_dir(cache_dir):
+        """Create the cache directory owner-only, refusing one owned by another user
+        
+        An existing directory keeps the permissions its operator chose, with a
+        warning if other users can read it.
+        """
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        
+        if hasattr(os, 'getuid'):
+            dir_stat = os.stat(cache_dir)
+            if dir_stat.st_uid != os.getuid():
+                logger.warning(f"Not using TTS cache dir {cache_dir}: owned by another user")
+                return None
+            if dir_stat.st_mode & 0o077:
+                logger.warning(
+                    f"TTS cache dir {cache_dir} is accessible to other users "
+                    f"(mode {oct(dir_stat.st_mode & 0o777)})"
+                )
+        
+        return cache_dir
+    
+    def _load_secret(self):
+        """Return the hashing secret stored in the cache dir, creating it if needed
+        
+        Without a cache dir the secret only lives as long as the process.
+        """
+        if not self.cache_dir:
+            return os.urandom(32)
+        
+        path = os.path.join(self.cache_dir, CACHE_SECRET_FILE)
+        try:
+            with open(path, 'rb') as secret_file:
+                return secret_file.read()
+        except FileNotFoundError:
+            pass
+        
+        # Publish with link() so concurrent workers agree on a single secret
+        # and never read a partially written file
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(os.urandom(32))
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(temp_path)
+        
+        with open(path, 'rb') as secret_file:
+            return secret_file.read()
+    
+    def make_key(self, text, language, provider='gtts'):
+        """Build a stable cache key for a text/language/provider combination"""
+        digest = hashlib.blake2b(digest_size=16, key=self._secret)
+        digest.update(provider.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(language.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key):
+        """Return a cached result or None, checking memory before disk"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                return result
+        
+        result = self._load(key)
+        if result is not None:
+            self._remember(key, result)
+        return result
+    
+    def put(self, key, result):
+        """Store a result in memory and, if configured, on disk"""
+        self._remember(key, result)
+        self._store(key, result)
+    
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def audio_file(self, key):
+        """Return (path, format) of the cached audio on disk, or None"""
+        if not self.cache_dir:
+            return None
+        
+        for audio_format in AUDIO_MIMETYPES:
+            path = self._audio_path(key, audio_format)
+            if os.path.exists(path):
+                return path, audio_format
+        return None
+    
+    def _audio_path(self, key, audio_format):
+        return os.path.join(self.cache_dir, f'{key}.{audio_format}')
+    
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+    
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        
+        try:
+            with open(self._meta_path(key), 'rb') as meta_file:
+                result = orjson.loads(meta_file.read())
+            with open(self._audio_path(key, result['format']), 'rb') as audio_file:
+                result['audio_data'] = audio_file.read()
             
-            for viseme_id in viseme_sequence:
-                visemes.append({
-                    'viseme_id': viseme_id,
-                    'time_offset': current_time,
-                    'duration': viseme_duration
-                })
-                current_time += viseme_duration
-        
-        return visemes
-    
-    def _word_to_visemes(self, word):
-        """Convert word to approximate viseme sequence"""
-        visemes = []
-        
-        # Simple letter-to-viseme mapping for demonstration
-        letter_to_viseme = {
-            'a': 8, 'e': 10, 'i': 11, 'o': 12, 'u': 12,
-            'p': 1, 'b': 1, 'm': 1,
-            'f': 2, 'v': 2,
-            't': 4, 'd': 4, 'n': 4, 'l': 4, 's': 4,
-            'r': 5, 'ch': 5, 'sh': 5,
-            'k': 6, 'g': 6, 'w': 6, 'y': 6,
-            'h': 7,
-        }
+            # Refresh the sidecar's mtime so pruning evicts least recently used
+            os.utime(self._meta_path(key))
+        except (OSError, KeyError, orjson.JSONDecodeError):
+            return None
+        return result
+    
+    def _store(self, key, result):
+        if not self.cache_dir:
+            return
         
-        for char in word:
-            if char in letter_to_viseme:
-                visemes.append(letter_to_viseme[char])
-            else:
-                visemes.append(0)  # Silence for unknown characters
+        meta = {k: v for k, v in result.items() if k != 'audio_data'}
+        try:
+            # Publish the audio before the sidecar so a readable sidecar always
+            # has its complete audio next to it
+            self._write_atomic(self._audio_path(key, result['format']), result['audio_data'])
+            self._write_atomic(
+                self._meta_path(key), orjson.dumps(meta, option=orjson.OPT_SERIALIZE_NUMPY)
+            )
+        except OSError as e:
+            logger.warning(f"Could not write TTS cache entry {key}: {str(e)}")
+            return
+        
+        self._prune()
+    
+    def _prune(self):
+        """Delete the least recently used disk entries beyond disk_maxsize"""
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                # Only files named after a cache key belong to the cache
+                sidecars = [
+                    (entry.stat().st_mtime, entry.name[:-len('.json')])
+                    for entry in entries
+                    if entry.name.endswith('.json') and is_cache_key(entry.name[:-len('.json')])
+                ]
+        except OSError as e:
+            logger.warning(f"Could not prune TTS cache: {str(e)}")
+            return
+        
+        if len(sidecars) <= self.disk_maxsize:
+            return
         
-        return visemes if visemes else [0]
+        sidecars.sort()
+        for _, key in sidecars[:len(sidecars) - self.disk_maxsize]:
+            # Drop the sidecar first so readers see a miss, never orphaned metadata
+            paths = [self._meta_path(key)]
+            paths += [self._audio_path(key, audio_format) for audio_format in AUDIO_MIMETYPES]
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not prune TTS cache entry {key}: {str(e)}")
+    
+    def _write_atomic(self, path, data):
+        """Write data to a temp file and rename it into place
+        
+        Readers, including other workers writing the same key, only ever see
+        either no file or a complete one.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+# File in the cache dir holding the secret that keys cache hashes
+CACHE_SECRET_FILE = '.secret'
+
+# Texts longer than this are synthesized sentence by sentence
+SENTENCE_SPLIT_THRESHOLD = 120
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Most sentences of one text synthesized at the same time
+SENTENCE_WORKERS = int(os.environ.get('TTS_SENTENCE_WORKERS', 4))
+
+# Host gTTS talks to, used to warm the connection pool at startup
+GTTS_WARM_UP_URL = 'https://translate.google.com'
+
+def split_sentences(text):
+    """Split text on sentence boundaries into parts gTTS will accept
+    
+    gTTS refuses text made only of punctuation, so fragments like '. . .'
+    are merged into the sentence before them (or after, at the start).
+    """
+    sentences = []
+    for part in SENTENCE_BOUNDARY.split(text):
+        if not part.strip():
+            continue
+        if sentences and not (_has_words(part) and _has_words(sentences[-1])):
+            sentences[-1] = f'{sentences[-1]} {part}'
+        else:
+            sentences.append(part)
+    return sentences
+
+def _has_words(text):
+    return any(c.isalnum() for c in text)
+
+class _GTTSRequests:
+    """Stand-in for the requests module inside gtts.tts that hands out a shared session"""
+    
+    def __init__(self, session):
+        self._session = session
+    
+    def Session(self):
+        return self._session
+    
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+class _SharedSession(requests.Session):
+    """Session that stays open when gTTS closes it after each request"""
+    
+    def close(self):
+        pass
 
 class TTSService:
     """Text-to-Speech service with multiple provider support"""
     
     def __init__(self):
         self.viseme_mapper = VisemeMapper()
+        
+        # Reuse pooled connections across gTTS calls so TLS handshakes amortize
+        pool_size = int(os.environ.get('TTS_POOL_SIZE', 16))
+        self._session = _SharedSession()
+        self._session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=pool_size))
+        gtts_tts.requests = _GTTSRequests(self._session)
+        
+        # Resolve DNS and open a TLS connection in the background so the
+        # first real request lands on a warm socket
+        if os.environ.get('TTS_WARM_UP', 'True').lower() == 'true':
+            threading.Thread(target=self._warm_up_gtts, daemon=True).start()
+        
+        # Load the local Piper voice once so every request runs on warm weights
+        self.piper_voice = None
+        voice_path = os.environ.get('PIPER_VOICE', 'en_US-amy-low.onnx')
+        if PiperVoice is not None and os.path.exists(voice_path):
+            self.piper_voice = PiperVoice.load(voice_path)
+            logger.info(f"Loaded Piper voice: {voice_path}")
+    
+    def _warm_up_gtts(self):
+        """Open a pooled connection to the gTTS host"""
+        try:
+            # Match gTTS's own request settings so the warmed connection lands
+            # in the pool gTTS will draw from
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            self._session.head(GTTS_WARM_UP_URL, timeout=2, verify=False,
+                               proxies=urllib.request.getproxies())
+            logger.info("Warmed up gTTS connection")
+        except requests.RequestException as e:
+            logger.warning(f"Could not warm up gTTS connection: {str(e)}")
+    
+    @property
+    def providers(self):
+        """Names of the TTS providers available in this process"""
+        return ['gtts', 'piper'] if self.piper_voice is not None else ['gtts']
     
     def generate_speech_gtts(self, text, language='en'):
-        """Generate speech using Google Text-to-Speech (gTTS)"""
+        """Generate speech using Google Text-to-Speech (gTTS)
+        
+        Long texts are split into sentences that are synthesized concurrently
+        and joined in order, so latency follows the slowest sentence rather
+        than the whole text.
+        """
         try:
-            # Create TTS object
-            tts = gTTS(text=text, lang=language, slow=False)
-            
-            # Save to bytes buffer
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
+            sentences = [text]
+            if len(text) > SENTENCE_SPLIT_THRESHOLD:
+                sentences = split_sentences(text)
             
-            # Get audio duration (approximate)
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-                temp_file.write(audio_buffer.getvalue())
-                temp_file.flush()
+            if len(sentences) == 1:
+                audio_data, duration, sr = self._synthesize_gtts(text, language)
+                
+                # Generate visemes
+                visemes = self.viseme_mapper.generate_viseme_sequence(text, duration)
+            else:
+                # Each call gets its own bounded pool, so one long text never
+                # queues behind the sentences of other concurrent requests
+                workers = min(len(sentences), SENTENCE_WORKERS)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    parts = list(executor.map(
+                        lambda sentence: self._synthesize_gtts(sentence, language), sentences
+                    ))
                 
-                # Load audio to get duration
-                y, sr = librosa.load(temp_file.name)
-                duration = librosa.get_duration(y=y, sr=sr)
+                # MP3 frames are self-contained, so the sentence clips concatenate
+                # into one playable stream
+                audio_data = b''.join(part[0] for part in parts)
+                durations = [part[1] for part in parts]
+                duration = sum(durations)
+                sr = parts[0][2]
                 
-                # Clean up temp file
-                os.unlink(temp_file.name)
+                # Generate visemes per sentence, shifted to where each one starts
+                visemes = self.viseme_mapper.concatenate_sequences(
+                    [self.viseme_mapper.generate_viseme_sequence(sentence, sentence_duration)
+                     for sentence, sentence_duration in zip(sentences, durations)],
+                    np.cumsum([0.0] + durations[:-1])
+                )
+            
+            return {
+                'audio_data': audio_data,
+                'duration': duration,
+                'visemes': visemes,
+                'sample_rate': sr,
+                'format': 'mp3'
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in gTTS generation: {str(e)}")
+            raise
+    
+    def _synthesize_gtts(self, text, language):
+        """Fetch MP3 audio for text from gTTS, returning (audio, duration, sample_rate)"""
+        # Create TTS object
+        tts = gTTS(text=text, lang=language, slow=False)
+        
+        # Save to bytes buffer
+        audio_buffer = io.BytesIO()
+        tts.write_to_fp(audio_buffer)
+        audio_buffer.seek(0)
+        
+        # Read duration and sample rate from the MP3 frame headers
+        # instead of decoding the whole stream
+        audio_info = MP3(audio_buffer).info
+        return audio_buffer.getvalue(), audio_info.length, audio_info.sample_rate
+    
+    def generate_speech_piper(self, text, language='en'):
+        """Generate speech locally using a Piper voice model
+        
+        Piper voices are single-language, so the loaded voice determines the
+        spoken language.
+        """
+        try:
+            # Synthesize straight into an in-memory WAV file
+            audio_buffer = io.BytesIO()
+            with wave.open(audio_buffer, 'wb') as wav_file:
+                self.piper_voice.synthesize(text, wav_file)
+            
+            # The WAV header gives the exact duration without decoding
+            audio_buffer.seek(0)
+            with wave.open(audio_buffer, 'rb') as wav_file:
+                sr = wav_file.getframerate()
+                duration = wav_file.getnframes() / sr
             
             # Generate visemes
             visemes = self.viseme_mapper.generate_viseme_sequence(text, duration)
             
-            audio_buffer.seek(0)
             return {
                 'audio_data': audio_buffer.getvalue(),
                 'duration': duration,
                 'visemes': visemes,
                 'sample_rate': sr,
-                'format': 'mp3'
+                'format': 'wav'
             }
             
         except Exception as e:
-            logger.error(f"Error in gTTS generation: {str(e)}")
+            logger.error(f"Error in Piper generation: {str(e)}")
             raise
 
 # Initialize services
 tts_service = TTSService()
+speech_cache = SpeechCache(
+    maxsize=int(os.environ.get('TTS_CACHE_SIZE', 256)),
+    cache_dir=os.environ.get('TTS_CACHE_DIR') or None,
+    disk_maxsize=int(os.environ.get('TTS_CACHE_DISK_SIZE', 4096)),
+    secret=os.environ.get('TTS_CACHE_SECRET') or None
+)
+
+# Cached speech files are immutable for a given key, so clients may keep them
+CACHE_MAX_AGE = 86400
+
+# Largest X-Visemes value sent inline; proxies commonly cap headers at 4-8 KB
+MAX_VISEMES_HEADER_SIZE = int(os.environ.get('TTS_MAX_VISEMES_HEADER', 2048))
+
+# Content types for the audio formats the providers produce
+AUDIO_MIMETYPES = {'mp3': 'audio/mpeg', 'wav': 'audio/wav'}
+
+# Binary response format negotiated through the Accept header
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+# Viseme layouts clients can ask for: parallel arrays or one record per viseme
+VISEME_LAYOUTS = ('track', 'records')
+
+# Limits for batch requests; each batch gets its own pool of at most
+# BATCH_WORKERS threads for network-bound synthesis
+MAX_BATCH_SIZE = int(os.environ.get('TTS_MAX_BATCH_SIZE', 32))
+BATCH_WORKERS = int(os.environ.get('TTS_BATCH_WORKERS', 8))
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return ojsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'service': 'AI Avatar Generator API'
     })
 
+def ojsonify(obj):
+    """Serialize obj to a JSON response with orjson, including NumPy arrays"""
+    return Response(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY), mimetype='application/json')
+
+def wants_msgpack():
+    """Check whether the client prefers MessagePack over JSON"""
+    best = request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+def payload_response(obj, binary):
+    """Serialize a speech payload as MessagePack or JSON"""
+    if binary:
+        return Response(msgpack.packb(obj), mimetype=MSGPACK_MIMETYPE)
+    return ojsonify(obj)
+
+def parse_speech_request(allow_batch=False):
+    """Validate a speech request body, returning (params, error_response)
+    
+    With allow_batch, 'text' may also be a list of strings, which is
+    returned as a list of stripped texts.
+    """
+    data = request.get_json()
+    
+    if not data or 'text' not in data:
+        return None, (ojsonify({'error': 'Text input required'}), 400)
+    
+    if allow_batch and isinstance(data['text'], list):
+        if not data['text'] or len(data['text']) > MAX_BATCH_SIZE:
+            return None, (ojsonify({'error': f'Batch must contain 1 to {MAX_BATCH_SIZE} texts'}), 400)
+        if not all(isinstance(item, str) for item in data['text']):
+            return None, (ojsonify({'error': 'Batch texts must be strings'}), 400)
+        
+        text = [item.strip() for item in data['text']]
+        if not all(text):
+            return None, (ojsonify({'error': 'Empty text input'}), 400)
+    else:
+        if not isinstance(data['text'], str):
+            return None, (ojsonify({'error': 'Text input must be a string'}), 400)
+        
+        text = data['text'].strip()
+        if not text:
+            return None, (ojsonify({'error': 'Empty text input'}), 400)
+    
+    language = data.get('language', 'en')
+    provider = data.get('provider', 'gtts')
+    
+    if provider not in tts_service.providers:
+        return None, (ojsonify({'error': f'Unsupported provider: {provider}'}), 400)
+    
+    viseme_layout = data.get('viseme_layout', 'track')
+    if viseme_layout not in VISEME_LAYOUTS:
+        return None, (ojsonify({'error': f'Unsupported viseme layout: {viseme_layout}'}), 400)
+    
+    return {
+        'text': text,
+        'language': language,
+        'provider': provider,
+        'viseme_layout': viseme_layout
+    }, None
+
+def get_speech(text, language, provider):
+    """Return (cache_key, result) for speech with visemes, serving repeat prompts from the cache"""
+    cache_key = speech_cache.make_key(text, language, provider)
+    result = speech_cache.get(cache_key)
+    
+    if result is None:
+        logger.info(f"Generating speech for text: '{text[:50]}...' with provider: {provider}")
+        
+        # Generate speech with visemes
+        if provider == 'piper':
+            result = tts_service.generate_speech_piper(text, language)
+        else:
+            result = tts_service.generate_speech_gtts(text, language)
+        speech_cache.put(cache_key, result)
+    else:
+        logger.info(f"Cache hit for text: '{text[:50]}...'")
+    
+    return cache_key, result
+
+def speech_payload(cache_key, result, params, binary=False):
+    """Build the response body for a single synthesized text
+    
+    With binary, the audio stays raw bytes and the viseme track is packed
+    into fixed-width arrays for MessagePack.
+    """
+    if binary:
+        audio_data = result['audio_data']
+        visemes = pack_visemes(result['visemes'], params['viseme_layout'])
+    else:
+        # Encode audio data as base64 for JSON response. The cache owns the
+        # audio bytes, so encode from a view of them and keep only the ASCII text
+        audio_data = b64encode(memoryview(result['audio_data'])).decode('ascii')
+        visemes = format_visemes(result['visemes'], params['viseme_layout'])
+    
+    return {
+        'success': True,
+        'audio_data': audio_data,
+        'duration': result['duration'],
+        'visemes': visemes,
+        'sample_rate': result['sample_rate'],
+        'format': result['format'],
+        'cache_key': cache_key,
+        **params
+    }
+
+def is_cache_key(value):
+    """Check that a URL segment looks like a cache key before touching the filesystem"""
+    return len(value) == 32 and all(c in '0123456789abcdef' for c in value)
+
+def format_visemes(visemes, layout):
+    """Lay out a viseme track as requested by the client"""
+    if layout == 'records':
+        return tts_service.viseme_mapper.to_records(visemes)
+    return visemes
+
+def pack_visemes(visemes, layout):
+    """Pack a viseme track as little-endian int8/float32 byte arrays"""
+    if layout == 'records':
+        return tts_service.viseme_mapper.to_records(visemes)
+    
+    return {
+        'viseme_ids': np.asarray(visemes['viseme_ids'], dtype='<i1').tobytes(),
+        'time_offsets': np.asarray(visemes['time_offsets'], dtype='<f4').tobytes(),
+        'durations': np.asarray(visemes['durations'], dtype='<f4').tobytes()
+    }
+
+def multipart_speech_response(visemes, audio_data, audio_mimetype):
+    """Build a multipart/mixed response holding the visemes JSON, then the audio"""
+    boundary = secrets.token_hex(16)
+    body = b''.join([
+        f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode('ascii'),
+        orjson.dumps(visemes, option=orjson.OPT_SERIALIZE_NUMPY),
+        f'\r\n--{boundary}\r\nContent-Type: {audio_mimetype}\r\n\r\n'.encode('ascii'),
+        audio_data,
+        f'\r\n--{boundary}--\r\n'.encode('ascii')
+    ])
+    return Response(body, mimetype=f'multipart/mixed; boundary={boundary}')
+
+def encode_visemes_header(visemes):
+    """Pack viseme data into a gzipped, base64-encoded JSON header value"""
+    payload = orjson.dumps(visemes, option=orjson.OPT_SERIALIZE_NUMPY)
+    return b64encode(gzip.compress(payload)).decode('ascii')
+
 @app.route('/api/generate-speech', methods=['POST'])
 def generate_speech():
     """Generate speech audio with viseme data for lip-sync"""
     try:
-        data = request.get_json()
+        params, error = parse_speech_request(allow_batch=True)
+        if error:
+            return error
         
-        if not data or 'text' not in data:
-            return jsonify({'error': 'Text input required'}), 400
+        binary = wants_msgpack()
         
-        text = data['text'].strip()
-        if not text:
-            return jsonify({'error': 'Empty text input'}), 400
+        if isinstance(params['text'], list):
+            # gTTS is network-bound, so a batch is synthesized concurrently
+            # on a pool of its own and returned in request order
+            texts = params['text']
+            with ThreadPoolExecutor(max_workers=min(len(texts), BATCH_WORKERS)) as executor:
+                results = list(executor.map(
+                    lambda text: get_speech(text, params['language'], params['provider']),
+                    texts
+                ))
+            return payload_response({
+                'success': True,
+                'results': [
+                    speech_payload(cache_key, result, {**params, 'text': text}, binary)
+                    for text, (cache_key, result) in zip(texts, results)
+                ]
+            }, binary)
         
-        language = data.get('language', 'en')
-        provider = data.get('provider', 'gtts')
+        cache_key, result = get_speech(params['text'], params['language'], params['provider'])
+        return payload_response(speech_payload(cache_key, result, params, binary), binary)
         
-        logger.info(f"Generating speech for text: '{text[:50]}...' with provider: {provider}")
+    except Exception as e:
+        logger.error(f"Error generating speech: {str(e)}")
+        return ojsonify({'error': str(e)}), 500
+
+@app.route('/api/generate-speech/stream', methods=['POST'])
+def generate_speech_stream():
+    """Generate speech as a raw audio response with visemes in a header"""
+    try:
+        params, error = parse_speech_request()
+        if error:
+            return error
         
-        # Generate speech with visemes
-        if provider == 'gtts':
-            result = tts_service.generate_speech_gtts(text, language)
+        cache_key, result = get_speech(params['text'], params['language'], params['provider'])
+        visemes = format_visemes(result['visemes'], params['viseme_layout'])
+        visemes_header = encode_visemes_header(visemes)
+        
+        if len(visemes_header) > MAX_VISEMES_HEADER_SIZE and not speech_cache.cache_dir:
+            # Long tracks would overflow typical proxy header buffers, and
+            # without a shared disk cache another worker could not serve them
+            # later, so they travel in the body next to the audio
+            response = multipart_speech_response(
+                visemes, result['audio_data'], AUDIO_MIMETYPES[result['format']]
+            )
         else:
-            return jsonify({'error': f'Unsupported provider: {provider}'}), 400
-        
-        # Encode audio data as base64 for JSON response
-        audio_base64 = base64.b64encode(result['audio_data']).decode('utf-8')
-        
-        return jsonify({
-            'success': True,
-            'audio_data': audio_base64,
-            'duration': result['duration'],
-            'visemes': result['visemes'],
-            'sample_rate': result['sample_rate'],
-            'format': result['format'],
-            'text': text,
-            'language': language,
-            'provider': provider
-        })
+            # Serve straight from the disk cache when possible so the server can
+            # hand the file to the OS instead of copying it through Python
+            audio_file = speech_cache.audio_file(cache_key)
+            if audio_file is not None:
+                path, audio_format = audio_file
+                response = send_file(
+                    path, mimetype=AUDIO_MIMETYPES[audio_format],
+                    etag=cache_key, conditional=True, max_age=CACHE_MAX_AGE
+                )
+            else:
+                response = Response(result['audio_data'], mimetype=AUDIO_MIMETYPES[result['format']])
+            
+            # Long tracks would overflow typical proxy header buffers, so those
+            # clients fetch the visemes from the cached speech route instead
+            if len(visemes_header) <= MAX_VISEMES_HEADER_SIZE:
+                response.headers['X-Visemes'] = visemes_header
+            else:
+                response.headers['X-Visemes-Url'] = url_for(
+                    'get_cached_visemes', cache_key=cache_key, layout=params['viseme_layout']
+                )
+        
+        response.headers['X-Cache-Key'] = cache_key
+        response.headers['X-Audio-Duration'] = str(result['duration'])
+        response.headers['X-Sample-Rate'] = str(result['sample_rate'])
+        return response
         
     except Exception as e:
-        logger.error(f"Error generating speech: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        logger.error(f"Error streaming speech: {str(e)}")
+        return ojsonify({'error': str(e)}), 500
+
+@app.route('/api/speech/<cache_key>/audio', methods=['GET'])
+def get_cached_audio(cache_key):
+    """Serve previously generated audio from the disk cache"""
+    audio_file = speech_cache.audio_file(cache_key) if is_cache_key(cache_key) else None
+    if audio_file is None:
+        return ojsonify({'error': 'Speech not found'}), 404
+    
+    path, audio_format = audio_file
+    return send_file(
+        path, mimetype=AUDIO_MIMETYPES[audio_format],
+        etag=cache_key, conditional=True, max_age=CACHE_MAX_AGE
+    )
+
+@app.route('/api/speech/<cache_key>/visemes', methods=['GET'])
+def get_cached_visemes(cache_key):
+    """Serve the visemes of previously generated audio
+    
+    Returns the same data the X-Visemes header carries, laid out as given by
+    the 'layout' query parameter.
+    """
+    layout = request.args.get('layout', 'track')
+    if layout not in VISEME_LAYOUTS:
+        return ojsonify({'error': f'Unsupported viseme layout: {layout}'}), 400
+    
+    result = speech_cache.get(cache_key) if is_cache_key(cache_key) else None
+    if result is None:
+        return ojsonify({'error': 'Speech not found'}), 404
+    
+    response = ojsonify(format_visemes(result['visemes'], layout))
+    response.set_etag(f'{cache_key}-{layout}')
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response.make_conditional(request)
 
 @app.route('/api/visemes/mapping', methods=['GET'])
 def get_viseme_mapping():
     """Get the viseme mapping information"""
-    return jsonify({
+    return ojsonify({
         'viseme_map': tts_service.viseme_mapper.VISEME_MAP,
         'viseme_count': tts_service.viseme_mapper.viseme_count,
         'description': 'Standard viseme mapping for lip-sync animation'
@@ -221,7 +965,7 @@ def get_viseme_mapping():
 @app.route('/api/avatar/info', methods=['GET'])
 def get_avatar_info():
     """Get information about supported avatar formats and features"""
-    return jsonify({
+    return ojsonify({
         'supported_formats': ['GLB', 'GLTF'],
         'avatar_providers': ['Ready Player Me', 'Custom'],
         'animation_features': ['lip_sync', 'facial_expressions', 'eye_movement'],
@@ -231,7 +231,7 @@ class AvatarApp {
             
             console.log('Speech generated successfully:', {
                 duration: result.duration,
-                visemes: result.visemes.length,
+                visemes: result.visemes.viseme_ids.length,
                 format: result.format
             });
             
@@ -30,13 +30,39 @@ class LipSyncEngine {
         console.log('LipSyncEngine initialized');
     }
     
+    /**
+     * Expand a viseme track or viseme records into viseme objects
+     * @param {Object|Array} track - Object with viseme_ids, time_offsets and durations arrays,
+     *     or an array of [viseme_id, time_offset, duration] records
+     * @returns {Array} Array of viseme objects with time_offset, viseme_id, duration
+     */
+    unpackTrack(track) {
+        if (Array.isArray(track)) {
+            return track.map(([visemeId, timeOffset, duration]) => ({
+                viseme_id: visemeId,
+                time_offset: timeOffset,
+                duration: duration
+            }));
+        }
+        
+        if (!track || !track.viseme_ids) return [];
+        
+        return track.viseme_ids.map((visemeId, i) => ({
+            viseme_id: visemeId,
+            time_offset: track.time_offsets[i],
+            duration: track.durations[i]
+        }));
+    }
+    
     /**
      * Start lip-sync animation with viseme sequence
-     * @param {Array} visemes - Array of viseme objects with time_offset, viseme_id, duration
+     * @param {Array|Object} visemes - Array of viseme objects with time_offset, viseme_id, duration,
+     *     a track of parallel viseme_ids/time_offsets/durations arrays, or viseme records
      * @param {number} audioStartTime - When the audio started playing (performance.now())
      */
     startAnimation(visemes, audioStartTime = null) {
-        this.visemeSequence = visemes || [];
+        const isObjectList = Array.isArray(visemes) && !Array.isArray(visemes[0]);
+        this.visemeSequence = isObjectList ? visemes : this.unpackTrack(visemes);
         this.isPlaying = true;
         this.startTime = audioStartTime || performance.now();
         this.currentVisemeIndex = 0;